@@ -5,6 +5,8 @@ from mailroom_model import DonorCollection
 from mailroom_model import MenuManager
 from mailroom_model import Helpers
 from mailroom_model import Validators
+from mailroom_model import ReportRenderer
+from mailroom_model import LetterManifest
 
 
 ##########################################################
@@ -48,9 +50,9 @@ class Menu(View):
 
 
 class Report(View):
-    def print_content(self, content):
-        for i in content:
-            print(i)
+    def stream_content(self, write_function):
+        """Stream report rows straight to the screen"""
+        write_function(sys.stdout)
 
 
 ##########################################################
@@ -92,28 +94,38 @@ def add_donation():
             "Enter the donor's email address"
         )
         valid = Validators().validate_donor_email(donor_email)
-    donor_found = donor_collection.select_donor(donor_email, "email")
-    if donor_found:
-        donor = donor_found[0]
-    else:
-        first_name = collect_name(add_donation_view, "first")
-        last_name = collect_name(add_donation_view, "last")
-        donor = donor_collection.add_new_donor(donor_email, first_name, last_name)
+    donation_key = add_donation_view.collect_user_input(
+        "Enter the transaction ID (optional)"
+    ).strip()
+    if donation_key and donor_collection.has_donation_key(donation_key):
         add_donation_view.print_content(
-            f"{first_name} {last_name} added to Donor Collection"
+            f"Transaction {donation_key} has already been recorded"
         )
-    valid = False
-    while not valid:
-        donation_amount = add_donation_view.collect_user_input(
-            "Enter the donation amount"
+    else:
+        donor_found = donor_collection.select_donor(donor_email, "email")
+        if donor_found:
+            donor = donor_found[0]
+        else:
+            first_name = collect_name(add_donation_view, "first")
+            last_name = collect_name(add_donation_view, "last")
+            donor = donor_collection.add_new_donor(donor_email, first_name, last_name)
+            add_donation_view.print_content(
+                f"{first_name} {last_name} added to Donor Collection"
+            )
+        valid = False
+        while not valid:
+            donation_amount = add_donation_view.collect_user_input(
+                "Enter the donation amount"
+            )
+            valid = Validators().validate_donation_amount(donation_amount)
+        donor_collection.add_donation(
+            donor, float(donation_amount), donation_key or None
+        )
+        add_donation_view.newline()
+        thank_you_details = donor.collect_donation_thank_you_details()
+        add_donation_view.print_content(
+            donor.thank_you_template().format(**thank_you_details)
         )
-        valid = Validators().validate_donation_amount(donation_amount)
-    donor.add_donation(float(donation_amount))
-    add_donation_view.newline()
-    thank_you_details = donor.collect_donation_thank_you_details()
-    add_donation_view.print_content(
-        donor.thank_you_template().format(**thank_you_details)
-    )
     add_donation_view.newline()
     add_donation_view.pause_screen()
     main_menu_view()
@@ -129,12 +141,11 @@ def collect_name(view, name_type):
 
 def list_of_donors():
     """Present a list of all donors in donor_collection"""
-    donor_list = donor_collection.generate_donor_list()
     donor_list_view = Report("Donor Report")
     donor_list_view.clear_screen()
     donor_list_view.print_title()
     donor_list_view.newline()
-    donor_list_view.print_content(donor_list)
+    donor_list_view.stream_content(donor_collection.write_donor_list)
     donor_list_view.newline()
     donor_list_view.pause_screen()
     main_menu_view()
@@ -142,33 +153,69 @@ def list_of_donors():
 
 def donor_report():
     """Present donor report for all donors in donor_collection"""
-    report = donor_collection.generate_donor_report()
     donor_report_view = Report("Donor Report")
     donor_report_view.clear_screen()
     donor_report_view.print_title()
     donor_report_view.newline()
-    donor_report_view.print_content(report)
+    donor_report_view.stream_content(donor_collection.write_donor_report)
     donor_report_view.newline()
     donor_report_view.pause_screen()
     main_menu_view()
 
 
+def export_donor_report():
+    """Write donor report for all donors in donor_collection to a file"""
+    export_view = View("Export Donor Report")
+    export_view.clear_screen()
+    export_view.print_title()
+    export_view.newline()
+    valid = False
+    while not valid:
+        output_format = export_view.collect_user_input(
+            f"Enter the report format ({', '.join(ReportRenderer.FORMATS)})"
+        ).lower()
+        valid = output_format in ReportRenderer.FORMATS
+    outfile = None
+    while outfile is None:
+        output_path = export_view.collect_user_input("Enter the output file path")
+        if not Validators().validate_value_exists(output_path):
+            continue
+        try:
+            outfile = open(output_path, "w", newline="")
+        except OSError as error:
+            export_view.print_content(f"Cannot write to {output_path}: {error}")
+    with outfile:
+        row_count = donor_collection.write_donor_report(outfile, output_format)
+    export_view.print_content(f"{row_count} donor rows written to {output_path}")
+    export_view.newline()
+    export_view.pause_screen()
+    main_menu_view()
+
+
 def create_thank_you_letters_for_donors():
-    """Generate thank you letters for all donors in parent folder on Desktop"""
+    """Generate thank you letters in parent folder on Desktop for donors
+    who changed or gave since their last letter
+    """
     thank_you_view = View("Create Thank You Letters for Donors")
     thank_you_view.clear_screen()
     thank_you_view.print_title()
     thank_you_view.newline()
-    donors_list = donor_collection.select_donor()
-    for donor in donors_list:
+    manifest = LetterManifest()
+    letter_count = 0
+    for donor in donor_collection.select_donors_for_letters(manifest):
         thank_you_details = donor.collect_donation_thank_you2_details()
         thank_you_letter = donor.thank_you_template2().format(**thank_you_details)
         Helpers().save_thank_you_message(
             donor.first_name, donor.last_name, thank_you_letter
         )
+        manifest.record_letter(donor)
+        letter_count += 1
         thank_you_view.print_content(
             f"Thank you letter saved for {donor.first_name} {donor.last_name}"
         )
+    manifest.complete_run()
+    if not letter_count:
+        thank_you_view.print_content("No donors changed since the last letters run")
     thank_you_view.newline()
     thank_you_view.pause_screen()
     main_menu_view()
@@ -189,6 +236,7 @@ program_main_menu = {
     "A": add_donation,
     "L": list_of_donors,
     "D": donor_report,
+    "X": export_donor_report,
     "C": create_thank_you_letters_for_donors,
     "E": exit_program,
 }
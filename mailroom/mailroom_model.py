@@ -1,4 +1,10 @@
 #!/usr/bin/env python3
+import csv
+import hashlib
+import io
+import json
+import mmap
+import struct
 from datetime import datetime
 from pathlib import Path
 from email_validator import validate_email, EmailNotValidError
@@ -30,10 +36,11 @@ class Helpers:
     def get_date(self, timestamp):
         return datetime.fromtimestamp(timestamp).strftime("%d %B %Y")
 
+    def get_thank_you_messages_path(self):
+        return Path.home() / "Desktop" / "thank_you_messages"
+
     def save_thank_you_message(self, first, last, thank_you_message):
-        desktop_path = Path.home() / "Desktop"
-        directory = f"thank_you_messages/{last}_{first}"
-        path = desktop_path / directory
+        path = self.get_thank_you_messages_path() / f"{last}_{first}"
         path.mkdir(parents=True, exist_ok=True)
         filename = f"{last}_{first}_{str(self.get_date(self.get_timestamp()))}.txt"
         with open(f"{path}/{filename}", "w") as outfile:
@@ -101,15 +108,37 @@ class Donor:
         self.donor_attributes = attributes
 
     def __str__(self):
-        return f"| {self.email:<30} | {self.first_name:<15} | {self.last_name:<15} | ${float(self.donation_total):<15,.2f} | {self.donation_count:<6} | ${float(self.donation_average):<15,.2f} |"
+        return ReportRenderer.REPORT_TABLE_ROW.format(**self.report_fields())
 
     def return_donor_list_details(self):
         """Return values for list of donors view"""
-        return f"{self.email:<30} | {self.first_name} {self.last_name}"
+        return ReportRenderer.LIST_TABLE_ROW.format(**self.list_fields())
+
+    def report_fields(self):
+        """Return the column values used by the donor report"""
+        return {
+            "email": self.email,
+            "first_name": self.first_name,
+            "last_name": self.last_name,
+            "donation_total": float(self.donation_total),
+            "donation_count": self.donation_count,
+            "donation_average": float(self.donation_average),
+        }
+
+    def list_fields(self):
+        """Return the column values used by the list of donors view"""
+        return {
+            "email": self.email,
+            "first_name": self.first_name,
+            "last_name": self.last_name,
+        }
 
-    def add_donation(self, new_donation):
-        """Add a new donation value and donation timestamp to list of donations"""
-        self.donations.append([new_donation, Helpers().get_timestamp()])
+    def add_donation(self, new_donation, donation_key=None):
+        """Add a new donation value, donation timestamp, and optional
+        idempotency key (e.g. external transaction ID) to list of donations
+        Duplicate keys are checked by DonorCollection.add_donation
+        """
+        self.donations.append([new_donation, Helpers().get_timestamp(), donation_key])
         self.donor_calculations()
 
     def donor_calculations(self):
@@ -183,27 +212,12 @@ class Donor:
         """
 
 
-class DonorCollection:
-    """Supported actions:
-    create a new Donor record, remove an existing Donor record,
-    update Donor record, select matching donors from donor collection,
-    generate Donor report
+class DonorReports:
+    """Read-only actions shared by DonorCollection and DonorSnapshot:
+    select matching donors, generate and stream Donor reports
+    Subclasses provide a self.donors sequence
     """
 
-    def __init__(self, limit=10, **attributes):
-        self.donors = []
-        self.limit = limit
-        self.collection_attributes = attributes
-
-    def add_new_donor(self, email, first_name, last_name):
-        """Add new donor record to donor collection"""
-        if self.select_donor(email, "email"):
-            return False
-        else:
-            new_donor = Donor(email, first_name, last_name)
-            self.donors.append(new_donor)
-            return new_donor
-
     def select_donor(self, donor_data="*", donor_field="*"):
         """Return list of donor records based on donor_identifier value
         exact email match returns 1
@@ -243,6 +257,488 @@ class DonorCollection:
             donor_list.append(donor.return_donor_list_details())
         return donor_list
 
+    def select_donors_for_letters(self, manifest):
+        """Yield only donors whose letter inputs changed since their last letter"""
+        for donor in self.donors:
+            if manifest.needs_letter(donor):
+                yield donor
+
+    def write_donor_report(self, writer, output_format="table"):
+        """Stream the donor report into writer without building a full list"""
+        return ReportRenderer(output_format).write_donor_report(self.donors, writer)
+
+    def write_donor_list(self, writer, output_format="table"):
+        """Stream the list of donor names and emails into writer"""
+        return ReportRenderer(output_format).write_donor_list(self.donors, writer)
+
+
+class DonorCollection(DonorReports):
+    """Supported actions:
+    create a new Donor record, remove an existing Donor record,
+    update Donor record, select matching donors from donor collection,
+    generate Donor report
+    """
+
+    def __init__(self, limit=10, **attributes):
+        self.donors = []
+        self.donation_keys = set()
+        self.limit = limit
+        self.collection_attributes = attributes
+
+    def add_new_donor(self, email, first_name, last_name):
+        """Add new donor record to donor collection"""
+        return self.add_donor(Donor(email, first_name, last_name))
+
+    def add_donor(self, donor):
+        """Add an existing Donor record and its donation keys to donor collection"""
+        if self.select_donor(donor.email, "email"):
+            return False
+        self.donors.append(donor)
+        self.donation_keys.update(self.donor_donation_keys(donor))
+        return donor
+
+    def donor_donation_keys(self, donor):
+        return [
+            donation[2]
+            for donation in donor.donations
+            if len(donation) > 2 and donation[2] is not None
+        ]
+
+    def rebuild_donation_keys(self):
+        """Rebuild the collection-wide key set from donor.donations
+        Only needed after loading stored donors outside add_new_donor/add_donor
+        """
+        self.donation_keys = set()
+        for donor in self.donors:
+            self.donation_keys.update(self.donor_donation_keys(donor))
+
+    def has_donation_key(self, donation_key):
+        return donation_key in self.donation_keys
+
+    def add_donation(self, donor, new_donation, donation_key=None):
+        """Add a donation to donor, rejecting a donation_key already seen
+        anywhere in the collection. Keyed donations must be added here, not
+        through Donor.add_donation, for the check to apply
+        """
+        if donation_key is not None and not isinstance(donation_key, str):
+            raise TypeError(f"Donation key must be a string: {donation_key!r}")
+        if self.has_donation_key(donation_key):
+            return False
+        donor.add_donation(new_donation, donation_key)
+        if donation_key is not None:
+            self.donation_keys.add(donation_key)
+        return donor
+
+    def load_donations(self, donations):
+        """Bulk add (email, donation, donation_key) records for existing donors
+        Return a list of (record, reason) pairs for each rejected record
+        """
+        donors_by_email = {donor.email: donor for donor in self.donors}
+        rejected = []
+        for record in donations:
+            email, new_donation, donation_key = record
+            donor = donors_by_email.get(email)
+            if donor is None:
+                rejected.append((record, "Unknown donor"))
+            elif donation_key is not None and not isinstance(donation_key, str):
+                rejected.append((record, "Invalid donation key"))
+            elif not self.add_donation(donor, new_donation, donation_key):
+                rejected.append((record, "Duplicate donation key"))
+        return rejected
+
+    def write_snapshot(self, path):
+        """Write the collection to a read-only binary snapshot at path"""
+        DonorSnapshot.write(self, path)
+
+
+class LetterManifest:
+    """Supported actions:
+    fingerprint the inputs of each donor's thank you letter, record letters
+    as they are written, compact the journal when a letters run finishes
+
+    The fingerprint hashes the values the letter is rendered from (name,
+    dates, donation total), so it survives restarts: a donor only gets a new
+    letter when their letter would read differently. Letters are journaled
+    one JSON line per write, so an interrupted run can resume without
+    redoing the letters it already finished.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = Helpers().get_thank_you_messages_path() / "manifest.jsonl"
+        self.path = Path(path)
+        self.letters = {}
+        self.load()
+
+    def load(self):
+        """Replay the manifest journal, later entries win"""
+        if not self.path.exists():
+            return
+        with open(self.path) as infile:
+            for line in infile:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if not isinstance(entry, dict):
+                    continue
+                if "email" in entry and "fingerprint" in entry:
+                    self.letters[entry["email"]] = entry["fingerprint"]
+
+    def letter_fingerprint(self, donor):
+        """Return a hash of the values donor's thank you letter is rendered from"""
+        thank_you_details = donor.collect_donation_thank_you2_details()
+        encoded = json.dumps(thank_you_details, sort_keys=True).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def needs_letter(self, donor):
+        """Return True if donor has donations and their letter inputs changed
+        since their last letter
+        """
+        if not donor.donations:
+            return False
+        return self.letters.get(donor.email) != self.letter_fingerprint(donor)
+
+    def record_letter(self, donor):
+        """Journal that a letter was written for donor's current letter inputs"""
+        fingerprint = self.letter_fingerprint(donor)
+        self.letters[donor.email] = fingerprint
+        self.append_entry({"email": donor.email, "fingerprint": fingerprint})
+
+    def complete_run(self):
+        """Compact the journal to one line per donor once a run finishes"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_suffix(".tmp")
+        with open(temp_path, "w") as outfile:
+            for email, fingerprint in self.letters.items():
+                entry = {"email": email, "fingerprint": fingerprint}
+                outfile.write(json.dumps(entry) + "\n")
+        temp_path.replace(self.path)
+
+    def append_entry(self, entry):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a") as outfile:
+            outfile.write(json.dumps(entry) + "\n")
+
+
+class ReportRenderer:
+    """Supported actions:
+    stream donor report rows or donor list rows into any object with a
+    write() method, as a fixed-width table, CSV, or JSON Lines
+    """
+
+    FORMATS = ("table", "csv", "jsonl")
+    REPORT_TABLE_ROW = "| {email:<30} | {first_name:<15} | {last_name:<15} | ${donation_total:<15,.2f} | {donation_count:<6} | ${donation_average:<15,.2f} |"
+    LIST_TABLE_ROW = "{email:<30} | {first_name} {last_name}"
+    REPORT_COLUMNS = (
+        "email",
+        "first_name",
+        "last_name",
+        "donation_total",
+        "donation_count",
+        "donation_average",
+    )
+    LIST_COLUMNS = ("email", "first_name", "last_name")
+
+    def __init__(self, output_format="table", chunk_size=1000):
+        if output_format not in self.FORMATS:
+            raise ValueError(f"Unsupported report format: {output_format}")
+        if chunk_size < 1:
+            raise ValueError(f"Report chunk_size must be at least 1: {chunk_size}")
+        self.output_format = output_format
+        self.chunk_size = chunk_size
+
+    def write_donor_report(self, donors, writer):
+        """Write one report row per donor, return the number of rows written"""
+        rows = (donor.report_fields() for donor in donors)
+        return self.write_rows(rows, writer, self.REPORT_COLUMNS, self.REPORT_TABLE_ROW)
+
+    def write_donor_list(self, donors, writer):
+        """Write one list row per donor, return the number of rows written"""
+        rows = (donor.list_fields() for donor in donors)
+        return self.write_rows(rows, writer, self.LIST_COLUMNS, self.LIST_TABLE_ROW)
+
+    def write_rows(self, rows, writer, columns, table_row):
+        """Format rows into a chunk buffer and flush it to writer every
+        chunk_size rows, so memory stays flat regardless of row count
+        """
+        buffer = io.StringIO()
+        format_row = self.row_formatter(buffer, columns, table_row)
+        row_count = 0
+        for row in rows:
+            format_row(row)
+            row_count += 1
+            if row_count % self.chunk_size == 0:
+                writer.write(buffer.getvalue())
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            writer.write(buffer.getvalue())
+        return row_count
+
+    def row_formatter(self, buffer, columns, table_row):
+        """Return a function that writes a single row into buffer"""
+        match self.output_format:
+            case "csv":
+                csv_writer = csv.DictWriter(
+                    buffer, fieldnames=columns, lineterminator="\n"
+                )
+                csv_writer.writeheader()
+                return csv_writer.writerow
+            case "jsonl":
+                return lambda row: buffer.write(json.dumps(row) + "\n")
+            case _:
+                return lambda row: buffer.write(table_row.format(**row) + "\n")
+
+
+class SnapshotDonor(Donor):
+    """Read-only Donor backed by a DonorSnapshot record
+    Report values are read from the record, donations are decoded on access.
+    Sets every attribute Donor.__init__ does, with donations as a property
+    """
+
+    def __init__(self, snapshot, index):
+        (
+            email_ref,
+            first_name_ref,
+            last_name_ref,
+            self.created,
+            deactivated_flag,
+            deactivated_timestamp,
+            self.donation_start,
+            self.donation_count,
+            self.donation_total,
+        ) = snapshot.read_donor_record(index)
+        snapshot.check_donation_range(self.donation_start, self.donation_count)
+        self.snapshot = snapshot
+        self.email = snapshot.read_string(*email_ref)
+        self.first_name = snapshot.read_string(*first_name_ref)
+        self.last_name = snapshot.read_string(*last_name_ref)
+        self.deactivated = [bool(deactivated_flag), deactivated_timestamp]
+        if self.donation_count:
+            self.donation_average = self.donation_total / self.donation_count
+        else:
+            self.donation_average = 0.0
+        self.donor_attributes = {}
+
+    @property
+    def donations(self):
+        return self.snapshot.read_donations(self.donation_start, self.donation_count)
+
+    def add_donation(self, new_donation, donation_key=None):
+        raise TypeError("Snapshot donors are read-only")
+
+    def update_donor_data(self, data_type, update_data):
+        raise TypeError("Snapshot donors are read-only")
+
+    def deactivate_donor(self):
+        raise TypeError("Snapshot donors are read-only")
+
+    def donor_calculations(self):
+        raise TypeError("Snapshot donors are read-only")
+
+
+class SnapshotDonors:
+    """Read-only sequence view over the donor records of a DonorSnapshot"""
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def __len__(self):
+        return self.snapshot.donor_count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Snapshot donor index out of range")
+        return SnapshotDonor(self.snapshot, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield SnapshotDonor(self.snapshot, index)
+
+
+class DonorSnapshot(DonorReports):
+    """Supported actions:
+    write a DonorCollection to a compact binary snapshot, open a snapshot
+    read-only with mmap, select donors and generate reports from it
+
+    Layout: header, fixed-width donor records, fixed-width donation records,
+    then a UTF-8 string table referenced by (offset, length) pairs.
+    Donor objects are only built when a record is accessed.
+    """
+
+    MAGIC = b"MRSNAP01"
+    VERSION = 1
+    HEADER = struct.Struct("<8sHQQQQQ")
+    # email, first_name, last_name string refs, created,
+    # deactivated flag + timestamp, donation start, donation count, total
+    DONOR_RECORD = struct.Struct("<QIQIQIdBdQId")
+    # amount, timestamp, donation_key string ref
+    DONATION_RECORD = struct.Struct("<ddQI")
+    NO_KEY = 0xFFFFFFFF
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as infile:
+            try:
+                self.buffer = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ValueError(f"Not a donor snapshot: {self.path}")
+        try:
+            self.read_header()
+        except (ValueError, struct.error):
+            self.buffer.close()
+            raise ValueError(f"Not a donor snapshot: {self.path}")
+        self.donors = SnapshotDonors(self)
+
+    def read_header(self):
+        """Unpack the header and check its offsets fit within the file"""
+        if len(self.buffer) < self.HEADER.size:
+            raise ValueError("Snapshot header is truncated")
+        (
+            magic,
+            version,
+            self.donor_count,
+            self.donation_count,
+            self.donor_offset,
+            self.donation_offset,
+            self.string_offset,
+        ) = self.HEADER.unpack_from(self.buffer, 0)
+        if magic != self.MAGIC or version != self.VERSION:
+            raise ValueError("Snapshot magic or version does not match")
+        if (
+            self.donor_offset != self.HEADER.size
+            or self.donation_offset
+            != self.donor_offset + self.donor_count * self.DONOR_RECORD.size
+            or self.string_offset
+            != self.donation_offset + self.donation_count * self.DONATION_RECORD.size
+            or self.string_offset > len(self.buffer)
+        ):
+            raise ValueError("Snapshot body is truncated or malformed")
+
+    @classmethod
+    def write(cls, donor_collection, path):
+        """Write every donor in donor_collection to a snapshot file at path"""
+        donors = donor_collection.donors
+        donation_count = sum(len(donor.donations) for donor in donors)
+        donor_offset = cls.HEADER.size
+        donation_offset = donor_offset + len(donors) * cls.DONOR_RECORD.size
+        string_offset = donation_offset + donation_count * cls.DONATION_RECORD.size
+        strings = bytearray()
+
+        def add_string(value):
+            encoded = value.encode("utf-8")
+            ref = (len(strings), len(encoded))
+            strings.extend(encoded)
+            return ref
+
+        with open(path, "wb") as outfile:
+            outfile.write(
+                cls.HEADER.pack(
+                    cls.MAGIC,
+                    cls.VERSION,
+                    len(donors),
+                    donation_count,
+                    donor_offset,
+                    donation_offset,
+                    string_offset,
+                )
+            )
+            donation_start = 0
+            for donor in donors:
+                outfile.write(
+                    cls.DONOR_RECORD.pack(
+                        *add_string(donor.email),
+                        *add_string(donor.first_name),
+                        *add_string(donor.last_name),
+                        donor.created,
+                        donor.deactivated[0],
+                        donor.deactivated[1],
+                        donation_start,
+                        len(donor.donations),
+                        float(donor.donation_total),
+                    )
+                )
+                donation_start += len(donor.donations)
+            for donor in donors:
+                for donation in donor.donations:
+                    donation_key = donation[2] if len(donation) > 2 else None
+                    if donation_key is None:
+                        key_ref = (0, cls.NO_KEY)
+                    elif isinstance(donation_key, str):
+                        key_ref = add_string(donation_key)
+                    else:
+                        raise TypeError(
+                            f"Donation key must be a string: {donation_key!r}"
+                        )
+                    outfile.write(
+                        cls.DONATION_RECORD.pack(
+                            float(donation[0]), donation[1], *key_ref
+                        )
+                    )
+            outfile.write(strings)
+
+    def read_donor_record(self, index):
+        """Return donor record fields, with string refs grouped as (offset, length)"""
+        fields = self.DONOR_RECORD.unpack_from(
+            self.buffer, self.donor_offset + index * self.DONOR_RECORD.size
+        )
+        return (fields[0:2], fields[2:4], fields[4:6]) + fields[6:]
+
+    def read_string(self, offset, length):
+        """Return a string table entry, checking it lies within the file"""
+        if offset + length > len(self.buffer) - self.string_offset:
+            raise ValueError(f"Snapshot string reference is out of range: {self.path}")
+        start = self.string_offset + offset
+        try:
+            return self.buffer[start : start + length].decode("utf-8")
+        except UnicodeDecodeError:
+            raise ValueError(f"Snapshot string is not valid UTF-8: {self.path}")
+
+    def check_donation_range(self, start, count):
+        if start + count > self.donation_count:
+            raise ValueError(f"Snapshot donation range is out of range: {self.path}")
+
+    def read_donations(self, start, count):
+        """Return donations as [amount, timestamp, donation_key] lists"""
+        self.check_donation_range(start, count)
+        donations = []
+        for record_index in range(start, start + count):
+            amount, timestamp, key_offset, key_length = (
+                self.DONATION_RECORD.unpack_from(
+                    self.buffer,
+                    self.donation_offset + record_index * self.DONATION_RECORD.size,
+                )
+            )
+            if key_length == self.NO_KEY:
+                donation_key = None
+            else:
+                donation_key = self.read_string(key_offset, key_length)
+            donations.append([amount, timestamp, donation_key])
+        return donations
+
+    def __len__(self):
+        return len(self.donors)
+
+    def __getitem__(self, index):
+        return self.donors[index]
+
+    def __iter__(self):
+        return iter(self.donors)
+
+    def close(self):
+        self.buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
 
 class MenuManager:
     """Manages program menus and selections"""
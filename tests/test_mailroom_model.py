@@ -1,5 +1,7 @@
 #!/usr/bin/env python
 import sys
+import io
+import json
 import pytest, re
 from datetime import datetime
 from pathlib import Path
@@ -10,6 +12,9 @@ from mailroom.mailroom_model import DonorCollection
 from mailroom.mailroom_model import MenuManager
 from mailroom.mailroom_model import Helpers
 from mailroom.mailroom_model import Validators
+from mailroom.mailroom_model import ReportRenderer
+from mailroom.mailroom_model import LetterManifest
+from mailroom.mailroom_model import DonorSnapshot
 
 """
 Test Objectives:
@@ -196,6 +201,63 @@ def test_add_new_donor(test_donor_collection):
     )
 
 
+def test_add_donation_rejects_duplicate_keys(test_donor_collection):
+    """Ensure a donation_key is accepted once across the whole collection"""
+    donor1 = test_donor_collection.add_new_donor("test1@test.com", "Test", "One")
+    donor2 = test_donor_collection.add_new_donor("test2@test.com", "Test", "Two")
+    assert test_donor_collection.add_donation(donor1, 100, "txn-1") == donor1
+    assert donor1.donations[0][2] == "txn-1"
+    assert test_donor_collection.add_donation(donor1, 100, "txn-1") == False
+    assert test_donor_collection.add_donation(donor2, 100, "txn-1") == False
+    assert donor1.donation_total == 100
+    assert donor2.donations == []
+    assert test_donor_collection.add_donation(donor1, 50) == donor1
+    assert test_donor_collection.add_donation(donor1, 50) == donor1
+    assert donor1.donation_count == 3
+
+
+def test_donation_keys_are_owned_by_collection(test_donor_collection, test_donor):
+    """Ensure keys are tracked per collection and donors added with keys register them"""
+    donor1 = test_donor_collection.add_new_donor("test1@test.com", "Test", "One")
+    other_collection = DonorCollection()
+    assert other_collection.add_donation(donor1, 5, "t1") == donor1
+    assert not test_donor_collection.has_donation_key("t1")
+    assert test_donor_collection.add_donation(donor1, 5, "t2") == donor1
+    assert not other_collection.has_donation_key("t2")
+    test_donor.add_donation(5, "t3")
+    assert test_donor_collection.add_donor(test_donor) == test_donor
+    assert test_donor_collection.add_donation(donor1, 5, "t3") == False
+    test_donor_collection.donation_keys = set()
+    test_donor_collection.rebuild_donation_keys()
+    assert test_donor_collection.donation_keys == {"t1", "t2", "t3"}
+    with pytest.raises(TypeError):
+        test_donor_collection.add_donation(donor1, 5, 12345)
+    assert donor1.donation_count == 2
+
+
+def test_load_donations(test_donor_collection):
+    """Ensure bulk loads reject duplicate keys, unknown donors, and invalid keys"""
+    donor1 = test_donor_collection.add_new_donor("test1@test.com", "Test", "One")
+    donations = [
+        ("test1@test.com", 100, "txn-1"),
+        ("test1@test.com", 200, "txn-2"),
+        ("test1@test.com", 100, "txn-1"),
+        ("hey@there.com", 10, "txn-3"),
+        ("test1@test.com", 10, 12345),
+    ]
+    assert test_donor_collection.load_donations(donations) == [
+        (donations[2], "Duplicate donation key"),
+        (donations[3], "Unknown donor"),
+        (donations[4], "Invalid donation key"),
+    ]
+    assert donor1.donation_total == 300
+    assert test_donor_collection.load_donations(donations[:2]) == [
+        (donations[0], "Duplicate donation key"),
+        (donations[1], "Duplicate donation key"),
+    ]
+    assert donor1.donation_total == 300
+
+
 def test_select_donor(test_donor_collection):
     """Ensure selecting donors works for exact email match, fuzzy name match, and all"""
     assert test_donor_collection.donors == []
@@ -268,3 +330,236 @@ def test_generate_donor_list(test_donor_collection):
         donor2.return_donor_list_details(),
         donor3.return_donor_list_details(),
     ]
+
+
+####################################
+# REPORT RENDERER UNIT TESTS
+####################################
+
+
+def test_write_donor_report_table_matches_generate(test_donor_collection):
+    """Ensure streamed table rows match the generated report rows"""
+    donor1 = test_donor_collection.add_new_donor("test1@test.com", "Test", "One")
+    donor1.add_donation(100)
+    test_donor_collection.add_new_donor("test2@test.com", "Test", "Two")
+    output = io.StringIO()
+    assert test_donor_collection.write_donor_report(output) == 2
+    assert output.getvalue().splitlines() == test_donor_collection.generate_donor_report()
+    output = io.StringIO()
+    assert test_donor_collection.write_donor_list(output) == 2
+    assert output.getvalue().splitlines() == test_donor_collection.generate_donor_list()
+
+
+def test_write_donor_report_csv_and_jsonl(test_donor_collection):
+    """Ensure CSV output has a header row and JSON Lines output has one object per donor"""
+    donor1 = test_donor_collection.add_new_donor("test1@test.com", "Test", "One")
+    donor1.add_donation(50)
+    donor1.add_donation(150)
+    output = io.StringIO()
+    test_donor_collection.write_donor_report(output, "csv")
+    assert output.getvalue().splitlines() == [
+        ",".join(ReportRenderer.REPORT_COLUMNS),
+        "test1@test.com,Test,One,200.0,2,100.0",
+    ]
+    output = io.StringIO()
+    test_donor_collection.write_donor_list(output, "jsonl")
+    assert json.loads(output.getvalue()) == {
+        "email": "test1@test.com",
+        "first_name": "Test",
+        "last_name": "One",
+    }
+    with pytest.raises(ValueError):
+        ReportRenderer("xml")
+    with pytest.raises(ValueError):
+        ReportRenderer("csv", chunk_size=0)
+
+
+def test_write_donor_report_flushes_in_chunks(test_donor_collection):
+    """Ensure rows are written to the writer in chunk_size batches"""
+    for i in range(5):
+        test_donor_collection.add_new_donor(f"test{i}@test.com", "Test", f"{i}")
+    writes = []
+
+    class Writer:
+        def write(self, chunk):
+            writes.append(chunk)
+
+    renderer = ReportRenderer("jsonl", chunk_size=2)
+    assert renderer.write_donor_report(test_donor_collection.donors, Writer()) == 5
+    assert [chunk.count("\n") for chunk in writes] == [2, 2, 1]
+
+
+####################################
+# LETTER MANIFEST UNIT TESTS
+####################################
+
+
+def test_letter_manifest_selects_changed_donors(test_donor_collection, tmp_path):
+    """Ensure only donors whose letter inputs changed are selected for letters"""
+    manifest_path = tmp_path / "manifest.jsonl"
+    donor1 = test_donor_collection.add_new_donor("test1@test.com", "Test", "One")
+    donor1.add_donation(100)
+    donor2 = test_donor_collection.add_new_donor("test2@test.com", "Test", "Two")
+    donor2.add_donation(100)
+    test_donor_collection.add_new_donor("test3@test.com", "Test", "Three")
+    manifest = LetterManifest(manifest_path)
+    assert list(test_donor_collection.select_donors_for_letters(manifest)) == [
+        donor1,
+        donor2,
+    ]
+    manifest.record_letter(donor1)
+    manifest.record_letter(donor2)
+    manifest.complete_run()
+    manifest = LetterManifest(manifest_path)
+    assert list(test_donor_collection.select_donors_for_letters(manifest)) == []
+    donor2.add_donation(50)
+    assert list(test_donor_collection.select_donors_for_letters(manifest)) == [donor2]
+    donor1.update_donor_data("first_name", "Fred")
+    assert list(test_donor_collection.select_donors_for_letters(manifest)) == [
+        donor1,
+        donor2,
+    ]
+
+
+def test_letter_manifest_survives_restart(tmp_path):
+    """Ensure an equivalent collection rebuilt in a new session is not re-rendered"""
+    manifest_path = tmp_path / "manifest.jsonl"
+    first_session = DonorCollection()
+    Helpers().generate_seed_donors(first_session)
+    manifest = LetterManifest(manifest_path)
+    for donor in first_session.select_donors_for_letters(manifest):
+        manifest.record_letter(donor)
+    manifest.complete_run()
+    second_session = DonorCollection()
+    Helpers().generate_seed_donors(second_session)
+    manifest = LetterManifest(manifest_path)
+    assert list(second_session.select_donors_for_letters(manifest)) == []
+
+
+def test_letter_manifest_resumes_interrupted_run(test_donor_collection, tmp_path):
+    """Ensure letters recorded before an interruption are not redone"""
+    manifest_path = tmp_path / "manifest.jsonl"
+    donor1 = test_donor_collection.add_new_donor("test1@test.com", "Test", "One")
+    donor1.add_donation(100)
+    donor2 = test_donor_collection.add_new_donor("test2@test.com", "Test", "Two")
+    donor2.add_donation(100)
+    LetterManifest(manifest_path).record_letter(donor1)
+    with open(manifest_path, "a") as outfile:
+        outfile.write('{"email": "test2@test.com"}\n[1, 2]\nnot json\n')
+    manifest = LetterManifest(manifest_path)
+    assert list(test_donor_collection.select_donors_for_letters(manifest)) == [donor2]
+
+
+####################################
+# DONOR SNAPSHOT UNIT TESTS
+####################################
+
+
+def test_donor_snapshot_round_trip(test_donor_collection, tmp_path):
+    """Ensure a snapshot reproduces donors, donations, and reports"""
+    snapshot_path = tmp_path / "donors.snapshot"
+    donor1 = test_donor_collection.add_new_donor("test1@test.com", "Tést", "One")
+    test_donor_collection.add_donation(donor1, 100, "txn-1")
+    test_donor_collection.add_donation(donor1, 50.5)
+    donor2 = test_donor_collection.add_new_donor("test2@test.com", "Test", "Two")
+    donor2.deactivate_donor()
+    test_donor_collection.write_snapshot(snapshot_path)
+    with DonorSnapshot(snapshot_path) as snapshot:
+        assert len(snapshot) == 2
+        assert snapshot[0].email == donor1.email
+        assert snapshot[0].first_name == "Tést"
+        assert snapshot[0].donations == donor1.donations
+        assert snapshot[-1].donations == []
+        assert snapshot[1].deactivated == donor2.deactivated
+        assert (
+            snapshot.generate_donor_report()
+            == test_donor_collection.generate_donor_report()
+        )
+        assert (
+            snapshot.generate_donor_list() == test_donor_collection.generate_donor_list()
+        )
+        assert snapshot.select_donor("Two", "name")[0].email == donor2.email
+        with pytest.raises(IndexError):
+            snapshot[2]
+
+
+def test_donor_snapshot_is_read_only(test_donor_collection, tmp_path):
+    """Ensure snapshot donors reject changes and bad files are refused"""
+    snapshot_path = tmp_path / "donors.snapshot"
+    test_donor_collection.add_new_donor("test1@test.com", "Test", "One")
+    test_donor_collection.write_snapshot(snapshot_path)
+    with DonorSnapshot(snapshot_path) as snapshot:
+        with pytest.raises(TypeError):
+            snapshot[0].add_donation(100)
+        with pytest.raises(TypeError):
+            snapshot[0].update_donor_data("email", "new@test.com")
+    bad_path = tmp_path / "bad.snapshot"
+    bad_path.write_bytes(b"x" * DonorSnapshot.HEADER.size)
+    with pytest.raises(ValueError):
+        DonorSnapshot(bad_path)
+
+
+def test_donor_snapshot_rejects_truncated_files(test_donor_collection, tmp_path):
+    """Ensure empty, short, and truncated snapshot files raise ValueError"""
+    snapshot_path = tmp_path / "donors.snapshot"
+    donor1 = test_donor_collection.add_new_donor("test1@test.com", "Test", "One")
+    donor1.add_donation(100)
+    test_donor_collection.write_snapshot(snapshot_path)
+    snapshot_bytes = snapshot_path.read_bytes()
+    for truncated in [
+        b"",
+        DonorSnapshot.MAGIC,
+        snapshot_bytes[: DonorSnapshot.HEADER.size + 10],
+    ]:
+        bad_path = tmp_path / "truncated.snapshot"
+        bad_path.write_bytes(truncated)
+        with pytest.raises(ValueError):
+            DonorSnapshot(bad_path)
+
+
+def test_donor_snapshot_requires_string_keys(test_donor_collection, tmp_path):
+    """Ensure non-string donation keys are refused rather than stringified"""
+    donor1 = test_donor_collection.add_new_donor("test1@test.com", "Test", "One")
+    donor1.add_donation(100, 12345)
+    with pytest.raises(TypeError):
+        test_donor_collection.write_snapshot(tmp_path / "donors.snapshot")
+
+
+def test_donor_snapshot_rejects_corrupt_records(test_donor_collection, tmp_path):
+    """Ensure out of range string and donation references raise ValueError"""
+    snapshot_path = tmp_path / "donors.snapshot"
+    donor1 = test_donor_collection.add_new_donor("test1@test.com", "Test", "One")
+    donor1.add_donation(100)
+    test_donor_collection.write_snapshot(snapshot_path)
+    snapshot_bytes = snapshot_path.read_bytes()
+    fields = list(
+        DonorSnapshot.DONOR_RECORD.unpack_from(
+            snapshot_bytes, DonorSnapshot.HEADER.size
+        )
+    )
+    for field_index, bad_value in [(0, 10_000), (10, 5)]:
+        bad_fields = list(fields)
+        bad_fields[field_index] = bad_value
+        bad_path = tmp_path / "corrupt.snapshot"
+        bad_path.write_bytes(
+            snapshot_bytes[: DonorSnapshot.HEADER.size]
+            + DonorSnapshot.DONOR_RECORD.pack(*bad_fields)
+            + snapshot_bytes[
+                DonorSnapshot.HEADER.size + DonorSnapshot.DONOR_RECORD.size :
+            ]
+        )
+        with DonorSnapshot(bad_path) as snapshot:
+            with pytest.raises(ValueError):
+                snapshot[0]
+
+
+def test_snapshot_donor_in_collection_is_read_only(test_donor_collection, tmp_path):
+    """Ensure collection methods raise TypeError for snapshot donors"""
+    snapshot_path = tmp_path / "donors.snapshot"
+    test_donor_collection.add_new_donor("test1@test.com", "Test", "One")
+    test_donor_collection.write_snapshot(snapshot_path)
+    with DonorSnapshot(snapshot_path) as snapshot:
+        with pytest.raises(TypeError):
+            test_donor_collection.add_donation(snapshot[0], 5, "txn-1")
+        assert not test_donor_collection.has_donation_key("txn-1")
+        assert DonorCollection().add_donor(snapshot[0]).email == "test1@test.com"